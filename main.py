@@ -1,229 +1,410 @@
+import base64
+import hashlib
+import math
 import os
+import pickle
 import re
-from flask import Flask, render_template, request, url_for
-from bs4 import BeautifulSoup, Tag
+import tempfile
 from collections import Counter
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import math
+from contextlib import suppress
 from datetime import datetime
+from functools import lru_cache
+from html import escape
+
+from flask import Flask, render_template, request
+from lxml import etree
 
 app = Flask(__name__)
 UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+CACHE_FOLDER = 'cache'
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
+# bump when analyzer output changes so stale cached results are ignored
+CACHE_VERSION = 4
+# cached results kept on disk; the oldest are deleted past this
+CACHE_MAX_FILES = 500
+
+# ------------------- Compiled patterns -------------------
+# tags | http URLs | www links -- one scan instead of three
+_CLEAN_RE = re.compile(r"<[^>]+>|https?://\S+|www\.\S+")
+_RE_LEADING = re.compile(r"^(for|on|about)\s+", re.I)
+_RE_AT_TIME = re.compile(r"\bat \d{1,2}:\d{2}\b.*$")
+_RE_VIEWED = re.compile(r'\s*-\s*viewed$', re.I)
+_RE_VIEWED_TAIL = re.compile(r'viewed$', re.I)
+_RE_CARDS = re.compile(r'\bcard(s)?\b|\bin your feed\b', re.I)
+_RE_SEARCH_PHRASE = re.compile(r"Searched for|You searched for|Searched on Google for")
+_RE_YT_SEARCH_PHRASE = re.compile(r"Searched for|Search for|Searched on YouTube for")
+
+_MONTHS = {name: i for i, name in enumerate(
+    ("january", "february", "march", "april", "may", "june", "july",
+     "august", "september", "october", "november", "december"), 1)}
+# same shape strptime accepts for "%B %d, %Y at %H:%M"
+_RE_TIMESTAMP = re.compile(
+    r"(%s)\s+(\d{1,2}),\s+(\d{4})\s+at\s+(\d{1,2}):(\d{1,2})" % "|".join(_MONTHS), re.I)
 
 # ------------------- Small helpers -------------------
 def parse_datetime(text):
     """Try parsing Google Takeout-style timestamps like 'January 1, 2025 at 10:30'."""
+    m = _RE_TIMESTAMP.fullmatch(text)
+    if not m:
+        return None
     try:
-        return datetime.strptime(text, "%B %d, %Y at %H:%M")
-    except Exception:
+        return datetime(int(m[3]), _MONTHS[m[1].lower()], int(m[2]),
+                        int(m[4]), int(m[5]))
+    except ValueError:  # e.g. February 30
         return None
 
+def _has_own_text(node):
+    """Whether node has text outside its descendant <div>s."""
+    if node.text and node.text.strip():
+        return True
+    for child in node:
+        if child.tail and child.tail.strip():
+            return True
+        if isinstance(child.tag, str) and child.tag != 'div' and _has_own_text(child):
+            return True
+    return False
+
+# Takeout renders every activity as one card: <div class="outer-cell mdl-cell ...">,
+# whose last cell is a boilerplate caption: "Products:", optional "Details:", and
+# "Why is this here?" with a link to the account settings
+_CARD_CLASS = 'outer-cell'
+_CAPTION_CLASS = 'mdl-typography--caption'
+_CAPTION_XPATH = etree.XPath(
+    "descendant::div[contains(concat(' ', normalize-space(@class), ' '),"
+    f" ' {_CAPTION_CLASS} ')]")
+
+def _has_class(div, name):
+    return name in div.get('class', '').split()
+
+def iter_blocks(filepath):
+    """Stream the activity blocks of an uploaded Takeout HTML file.
+
+    Every Takeout card is a block, at whatever depth it sits. Outside cards the
+    blocks are the outermost <div>s, except that one with no text of its own
+    outside its child divs is a wrapper - like Takeout's page-level <div> - and
+    its child divs are the blocks instead. Blocks are yielded as soon as they
+    are fully parsed and released once the caller moves on, so memory stays
+    flat however large the export is.
+    """
+    if os.path.getsize(filepath) == 0:
+        return  # lxml refuses an empty document; treat it as one without divs
+    depth = 0
+    card = None         # the open card; divs inside it belong to it
+    cards = 0           # cards yielded so far
+    cards_at = [0, 0]   # value of `cards` when the open depth 0 / depth 1 div started
+    top = None
+    whole = False     # top has text of its own, so it is one block with its children
+    streamed = False  # top's children were yielded as blocks
+    for event, div in etree.iterparse(filepath, events=('start', 'end'), tag='div',
+                                      html=True, encoding='utf-8'):
+        if event == 'start':
+            if card is None and _has_class(div, _CARD_CLASS):
+                card = div
+            if depth == 0:
+                top, whole, streamed = div, False, False
+            if depth < 2:
+                cards_at[depth] = cards
+            depth += 1
+            continue
+        depth -= 1
+        if div is card:
+            card = None
+            cards += 1
+            yield div
+        elif card is not None or depth > 1:
+            continue  # handled together with its enclosing block
+        elif cards > cards_at[depth]:
+            pass  # holds cards, which were its blocks
+        elif depth == 1:
+            whole = whole or _has_own_text(top)
+            if whole:
+                continue  # kept for top
+            streamed = True
+            yield div
+        elif whole or not streamed or _has_own_text(div):
+            yield div
+        div.clear(keep_tail=True)
+        while div.getprevious() is not None:
+            del div.getparent()[0]
+
+def drop_captions(div):
+    """Remove the caption cells under div, leaving its header and content."""
+    for caption in _CAPTION_XPATH(div):
+        caption.getparent().remove(caption)
+
+def activity_divs(block):
+    """The divs of a block worth analyzing: the block itself if it is a Takeout
+    card, else each of its <div>s but caption cells (non-Takeout or restyled
+    exports)."""
+    if _has_class(block, _CARD_CLASS):
+        return [block]
+    return [div for div in block.iter('div') if not _has_class(div, _CAPTION_CLASS)]
+
+def iter_divs(filepath):
+    """The upload's activity divs (see activity_divs), in document order."""
+    for block in iter_blocks(filepath):
+        yield from activity_divs(block)
+
+def text_parts(node):
+    """Stripped, non-empty text fragments of a node, in document order."""
+    return [p for p in map(str.strip, node.itertext()) if p]
+
+def node_text(node, separator=''):
+    """lxml counterpart of BeautifulSoup's get_text(separator, strip=True)."""
+    return separator.join(text_parts(node))
+
+# bytes.translate table over UTF-8: ASCII letters/digits are kept (lowercased),
+# every other byte - including each byte of a multi-byte character - becomes a space
+_ALNUM_TABLE = bytes(
+    c if (chr(c).isascii() and chr(c).isalnum()) else 0x20 for c in range(256)
+).lower()
+
 def clean_text(s: str) -> str:
         if not s:
             return ""
-        s = re.sub(r"<[^>]+>", "", s)  # remove HTML tags
-        s = re.sub(r"https?://\S+", "", s)  # remove URLs
-        s = re.sub(r"www\.\S+", "", s)  # remove www links
-        s = re.sub(r"[^A-Za-z0-9\s]", " ", s)  # remove special chars
-        s = re.sub(r"\s+", " ", s).strip()
-        return s.lower()
+        s = _CLEAN_RE.sub("", s)  # remove HTML tags and links
+        # remove special chars, collapse whitespace, lowercase (bytes: C fast paths)
+        b = s.encode('utf-8').translate(_ALNUM_TABLE)
+        return b" ".join(b.split()).decode('ascii')
+
+_JUNK_WORDS = frozenset({"here", "click", "login", "home", "ok"})
+# distinct items (raw memo and cleaned counts) kept by a Top5Tally before the
+# long tail is pruned; results are exact below this
+TOP5_CAPACITY = 50_000
 
 def clean_top5_item(s: str) -> str:
-        junk_words = {"here", "click", "login", "home", "ok"}
-        words = [w for w in s.split() if w not in junk_words and len(w) > 2]
-        return " ".join(words).strip()
-
-def top5_from_list(items):
-        cleaned_items = [clean_top5_item(clean_text(x)) for x in items if clean_text(x)]
-        cleaned_items = [x for x in cleaned_items if x]
-        if not cleaned_items:
-            return [("No data found", 0)]
-        return Counter(cleaned_items).most_common(5)
-
-# ------------------- Generic analyzer -------------------
-def analyze_generic_file(filepath):
-    categories = {"Search":0,"YouTube":0,"Maps":0,"Shopping":0,"Discover":0,"Other":0}
+        words = [w for w in s.split() if w not in _JUNK_WORDS and len(w) > 2]
+        return " ".join(words)
+
+def clean_top5_raw(raw: str) -> str:
+        return clean_top5_item(clean_text(raw))
+
+class Top5Tally:
+    """Top 5 candidates, counted as the scanners append them.
+
+    Raw items are never stored, and past TOP5_CAPACITY distinct items the long
+    tail is pruned, so memory stays bounded however large the upload is.
+    `clean` maps a raw item to the counted form (empty means skip); Takeout
+    repeats the same titles/queries a lot, so a bounded memo runs it once per
+    recent distinct item.
+    """
+
+    def __init__(self, clean=None):
+        self.counts = Counter()
+        self.appended = 0  # every raw item, counted or not
+        self._clean = lru_cache(maxsize=TOP5_CAPACITY)(clean) if clean else None
+
+    def __len__(self):
+        return self.appended
+
+    def append(self, raw):
+        self.appended += 1
+        if self._clean is not None:
+            raw = self._clean(raw)
+            if not raw:
+                return
+        counts = self.counts
+        counts[raw] = counts.get(raw, 0) + 1  # skips Counter.__missing__ on new items
+        if len(counts) > TOP5_CAPACITY:
+            self.counts = Counter(dict(counts.most_common(TOP5_CAPACITY // 2)))
+
+# ------------------- Analyzer -------------------
+MODE_CATEGORIES = {
+    "generic": ("Search", "YouTube", "Maps", "Shopping", "Discover", "Other"),
+    "search": ("Search", "Other"),
+    "youtube": ("YouTube", "Search", "Maps", "Shopping", "Discover", "Other"),
+    "discover": ("Discover",),
+}
+
+# very loose categorization: first keyword found wins, so order is precedence
+# ("search" also covers "searched")
+GENERIC_KEYWORDS = (
+    ("search", "Search"),
+    ("youtube", "YouTube"), ("watched", "YouTube"),
+    ("maps", "Maps"), ("location", "Maps"), ("place", "Maps"),
+    ("shopping", "Shopping"), ("product", "Shopping"),
+    ("discover", "Discover"),
+)
+
+def categorize(low):
+    for keyword, category in GENERIC_KEYWORDS:
+        if keyword in low:
+            return category
+    return "Other"
+
+def _scan_generic(div, text, tags, items):
+    tags.append(categorize(text.lower()))
+
+    # collect something readable for Top 5 (best-effort)
+    a_tag = div.find('.//a')
+    if a_tag is not None:
+        items.append(node_text(a_tag))
+    else:
+        # fallback to the first sentence-ish chunk
+        chunk = clean_text(text.split(" • ")[0])
+        if chunk:
+            items.append(chunk)
+
+def _scan_search(text, tags, items):
+    m = _RE_SEARCH_PHRASE.search(text)
+    if not m:
+        tags.append("Other")
+        return
+    tags.append("Search")
+    # take the part after the phrase
+    term = clean_text(text[m.end():])
+    # remove leading connecting words
+    term = _RE_LEADING.sub("", term)
+    # drop obvious junk timestamps if stuck on same line
+    term = _RE_AT_TIME.sub("", term)
+    if term:
+        items.append(term)
+
+def _scan_youtube(div, text, queries, titles):
+    # capture YT searches
+    m = _RE_YT_SEARCH_PHRASE.search(text)
+    if m:
+        q = clean_text(text[m.end():])
+        q = _RE_LEADING.sub("", q)
+        if q:
+            queries.append(q)
+
+    # capture watched titles via links
+    a_tag = div.find('.//a')
+    if a_tag is not None:
+        href = a_tag.get('href','')
+        if 'youtube.com' in href or 'youtu.be' in href:
+            title = clean_text(node_text(a_tag))
+            if title and not title.lower().startswith("watched a video that has been removed"):
+                titles.append(title)
+
+def _scan_discover(parts, items):
+    """Collect Discover topics from one div.
+
+    Returns False if the div isn't a Discover block.
+    """
+    lines = [ln.strip() for ln in "\n".join(parts).splitlines() if ln.strip()]
+    if not lines:
+        return False
+
+    first_line = lines[0].lower()
+    block_text_lower = "\n".join(lines).lower()
+    is_discover = ('discover' in first_line) or ('products:' in block_text_lower and 'discover' in block_text_lower)
+    if not is_discover:
+        return False
+
+    start_index = 1
+    for i, ln in enumerate(lines):
+        if ln.lower().startswith('details'):
+            start_index = i+1
+            break
+
+    for ln in lines[start_index:]:
+        if ln.lower().startswith('why is this here'):
+            break
+        clean = _RE_VIEWED.sub('', ln).strip()
+        clean = _RE_VIEWED_TAIL.sub('', clean).strip()
+        if _RE_CARDS.search(clean):
+            continue
+        clean = clean_text(clean)
+        if clean:
+            items.append(clean)
+    return True
+
+def analyze_file(filepath, mode="generic"):
+    """Single pass over the upload's divs; `mode` picks the categorization rules.
+
+    Returns (categories, top5_data, activity_times).
+    """
+    categories = dict.fromkeys(MODE_CATEGORIES[mode], 0)
+    tags = []     # one category per div, tallied after the loop
+    # Top 5 candidates; Discover topics arrive already cleaned
+    items = Top5Tally() if mode == "discover" else Top5Tally(clean_top5_raw)
+    queries = Top5Tally(clean_top5_raw)  # YouTube searches, apart from watched titles
     activity_times = []
-    items_for_top5 = []  # generic catch-all
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(), 'html.parser')
-
-    for div in soup.find_all('div'):
-        text = div.get_text(separator=' ', strip=True)
-        low = text.lower()
-
-        # very loose categorization
-        if "searched" in low or "search" in low:
-            categories["Search"] += 1
-        elif "youtube" in low or "watched" in low:
-            categories["YouTube"] += 1
-        elif "maps" in low or "location" in low or "place" in low:
-            categories["Maps"] += 1
-        elif "shopping" in low or "product" in low:
-            categories["Shopping"] += 1
-        elif "discover" in low:
-            categories["Discover"] += 1
-        else:
-            categories["Other"] += 1
 
-        # collect something readable for Top 5 (best-effort)
-        a_tag = div.find('a')
-        if a_tag and isinstance(a_tag, Tag):
-            items_for_top5.append(a_tag.get_text(strip=True))
+    for div in iter_divs(filepath):
+        if mode != "discover":  # Discover topics live in the caption's "Details:" list
+            drop_captions(div)
+        parts = text_parts(div)
+        text = " ".join(parts)
+
+        if mode == "search":
+            _scan_search(text, tags, items)
+        elif mode == "youtube":
+            _scan_youtube(div, text, queries, items)
+        elif mode == "discover":
+            if not _scan_discover(parts, items):
+                continue
         else:
-            # fallback to the first sentence-ish chunk
-            chunk = clean_text(text.split(" • ")[0])
-            if chunk:
-                items_for_top5.append(chunk)
+            _scan_generic(div, text, tags, items)
 
         # timestamp extraction
-        span = div.find('span')
-        if span:
-            dt = parse_datetime(span.get_text(strip=True))
+        span = div.find('.//span')
+        if span is not None:
+            dt = parse_datetime(node_text(span))
             if dt:
                 activity_times.append(dt)
 
-    top5_data = top5_from_list(items_for_top5)
+    categories.update(Counter(tags))
+    counts = items.counts
+    if mode == "discover":
+        categories["Discover"] = len(items)
+    elif mode == "youtube":
+        categories["YouTube"] = len(items)
+        categories["Search"] = len(queries)
+        counts = queries.counts + counts  # searches rank first among ties
+    top5_data = counts.most_common(5) or [("No data found", 0)]
     return categories, top5_data, activity_times
 
-# ------------------- Search analyzer -------------------
-def analyze_search_file(filepath):
-    search_terms = []
-    categories = {"Search":0,"Other":0}
-    activity_times = []
-
-    with open(filepath,'r',encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(),'html.parser')
-
-    for div in soup.find_all('div'):
-        text = div.get_text(separator=' ', strip=True)
-        found = False
-        for phrase in ["Searched for", "You searched for", "Searched on Google for"]:
-            if phrase in text:
-                categories["Search"] += 1
-                # take the part after the phrase
-                term = text.split(phrase, 1)[1]
-                term = clean_text(term)
-                # remove leading connecting words
-                term = re.sub(r"^(for|on|about)\s+", "", term, flags=re.I)
-                # drop obvious junk timestamps if stuck on same line
-                term = re.sub(r"\bat \d{1,2}:\d{2}\b.*$", "", term)
-                if term:
-                    search_terms.append(term)
-                found = True
-                break
-        if not found:
-            categories["Other"] += 1
-
-        # timestamp extraction
-        span = div.find('span')
-        if span:
-            dt = parse_datetime(span.get_text(strip=True))
-            if dt:
-                activity_times.append(dt)
-
-    top5_data = top5_from_list(search_terms)
-    return categories, top5_data, activity_times
-
-# ------------------- YouTube analyzer -------------------
-def analyze_youtube_file(filepath):
-    video_titles = []
-    search_queries = []
-    categories = {"YouTube":0,"Search":0,"Maps":0,"Shopping":0,"Discover":0,"Other":0}
-    activity_times = []
-
-    with open(filepath,'r',encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(),'html.parser')
-
-    for div in soup.find_all('div'):
-        text = div.get_text(separator=' ', strip=True)
-
-        # capture YT searches
-        for phrase in ["Searched for", "Search for", "Searched on YouTube for"]:
-            if phrase in text:
-                q = clean_text(text.split(phrase,1)[1])
-                q = re.sub(r"^(for|on|about)\s+", "", q, flags=re.I)
-                if q:
-                    search_queries.append(q)
-
-        # capture watched titles via links
-        a_tag = div.find('a')
-        if a_tag and isinstance(a_tag, Tag):
-            href = a_tag.get('href','')
-            if 'youtube.com' in href or 'youtu.be' in href:
-                title = clean_text(a_tag.get_text(strip=True))
-                if title and not title.lower().startswith("watched a video that has been removed"):
-                    video_titles.append(title)
-
-        # timestamps
-        span = div.find('span')
-        if span:
-            dt = parse_datetime(span.get_text(strip=True))
-            if dt:
-                activity_times.append(dt)
-
-    combined = search_queries + video_titles
-    categories["YouTube"] = len(video_titles)
-    categories["Search"] = len(search_queries)
-
-    top5_data = top5_from_list(combined)
-    return categories, top5_data, activity_times
-
-# ------------------- Discover analyzer -------------------
-def analyze_discover_file(filepath):
-    items = []
-    categories = {"Discover":0}
-    activity_times = []
-
-    with open(filepath,'r',encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(),'html.parser')
-
-    for div in soup.find_all('div'):
-        text = div.get_text(separator='\n',strip=True)
-        if not text:
-            continue
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-        if not lines:
-            continue
-
-        first_line = lines[0].lower()
-        block_text_lower = "\n".join(lines).lower()
-        is_discover = ('discover' in first_line) or ('products:' in block_text_lower and 'discover' in block_text_lower)
-        if not is_discover:
-            continue
-
-        start_index = 1
-        for i, ln in enumerate(lines):
-            if ln.lower().startswith('details'):
-                start_index = i+1
-                break
-
-        for ln in lines[start_index:]:
-            if ln.lower().startswith('why is this here'):
-                break
-            clean = re.sub(r'\s*-\s*viewed$','',ln,flags=re.I).strip()
-            clean = re.sub(r'viewed$','',clean,flags=re.I).strip()
-            if re.search(r'\bcard(s)?\b|\bin your feed\b',clean,flags=re.I):
-                continue
-            clean = clean_text(clean)
-            if clean:
-                items.append(clean)
-
-        # timestamp
-        span = div.find('span')
-        if span:
-            dt = parse_datetime(span.get_text(strip=True))
-            if dt:
-                activity_times.append(dt)
+# ------------------- Result cache -------------------
+def save_upload(file, filepath):
+    """Write the upload to disk, hashing it on the way; returns the sha1 hex digest."""
+    digest = hashlib.sha1()
+    with open(filepath, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+def _cache_path(digest, mode):
+    name = f"{digest}.{mode}.v{CACHE_VERSION}.pkl"
+    return os.path.join(app.config['CACHE_FOLDER'], name)
+
+def load_cached_analysis(digest, mode):
+    """Return the cached analyze_file() result for this content, or None."""
+    try:
+        with open(_cache_path(digest, mode), 'rb') as f:
+            return pickle.load(f)
+    except Exception:  # missing or damaged: unpickling can raise almost anything
+        return None
 
-    counter = Counter(items)
-    top5_data = counter.most_common(5) if items else [("No data found", 0)]
-    categories["Discover"] = sum(counter.values())
-    return categories, top5_data, activity_times
+def store_cached_analysis(digest, mode, result):
+    os.makedirs(app.config['CACHE_FOLDER'], exist_ok=True)
+    # unique temp file per call: threads and gunicorn workers may store one key at once
+    fd, tmp_path = tempfile.mkstemp(dir=app.config['CACHE_FOLDER'], suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(result, f)
+        # atomic, readers never see half a file
+        os.replace(tmp_path, _cache_path(digest, mode))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    prune_cache()
+
+def prune_cache():
+    """Delete the oldest cached results until at most CACHE_MAX_FILES are left."""
+    entries = []
+    for entry in os.scandir(app.config['CACHE_FOLDER']):
+        if entry.name.endswith('.pkl'):
+            with suppress(FileNotFoundError):  # another worker may be pruning too
+                entries.append((entry.stat().st_mtime, entry.path))
+    entries.sort()
+    for _, path in entries[:-CACHE_MAX_FILES]:
+        with suppress(FileNotFoundError):
+            os.unlink(path)
 
 # ------------------- Risk + Suggestions (returns percent) -------------------
 def calculate_risk(categories, recent_activities=None):
@@ -243,9 +424,9 @@ def calculate_risk(categories, recent_activities=None):
     recent_risk = 0
     if recent_activities:
         now = datetime.now()
-        for act_time in recent_activities:
-            days_ago = (now - act_time).days
-            recent_risk += math.exp(-days_ago / 7)
+        # the decay only depends on whole days, so evaluate exp once per distinct day
+        days_ago = Counter((now - act_time).days for act_time in recent_activities)
+        recent_risk = sum(n * math.exp(-days / 7) for days, n in days_ago.items())
 
     total_risk = base_risk + recent_risk
 
@@ -290,6 +471,98 @@ def calculate_risk(categories, recent_activities=None):
             risk_percent
         )
 
+# ------------------- Charts -------------------
+# Charts are plain SVG built from strings: a pie and a five-bar chart don't need
+# a plotting library. They are embedded in the page as data: URIs, so nothing is
+# written to disk per upload.
+CHART_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b")
+_SVG_OPEN = ('<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" '
+             'viewBox="0 0 {w} {h}" '
+             'font-family="DejaVu Sans, Helvetica, Arial, sans-serif" font-size="12">'
+             '<rect width="{w}" height="{h}" fill="#fff"/>')
+
+def _svg_text(x, y, text, anchor="middle", size=12):
+    return (f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchor}" '
+            f'font-size="{size}" dominant-baseline="central">'
+            f'{escape(str(text))}</text>')
+
+def svg_data_uri(svg):
+    encoded = base64.b64encode(svg.encode('utf-8')).decode('ascii')
+    return "data:image/svg+xml;base64," + encoded
+
+def render_pie_svg(categories):
+    """Pie chart of category counts, counter-clockwise from 12 o'clock, as SVG."""
+    w = h = 600
+    cx, cy, r = w / 2, h / 2 + 10, 185
+    total = sum(categories.values())
+    out = [_SVG_OPEN.format(w=w, h=h),
+           _svg_text(w / 2, 58, 'Activity Breakdown', size=14)]
+
+    def point(angle, radius):
+        return cx + radius * math.cos(angle), cy - radius * math.sin(angle)
+
+    start = math.pi / 2
+    for i, (label, count) in enumerate(categories.items()):
+        color = CHART_COLORS[i % len(CHART_COLORS)]
+        sweep = 2 * math.pi * count / total
+        end = start + sweep
+        if count == total:
+            out.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}"/>')
+        else:
+            x1, y1 = point(start, r)
+            x2, y2 = point(end, r)
+            large = 1 if sweep > math.pi else 0
+            out.append(f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} '
+                       f'A{r},{r} 0 {large} 0 {x2:.2f},{y2:.2f} Z" '
+                       f'fill="{color}"/>')
+        mid = start + sweep / 2
+        lx, ly = point(mid, r * 1.1)
+        out.append(_svg_text(lx, ly, label, anchor="start" if lx >= cx else "end"))
+        px, py = point(mid, r * 0.6)
+        out.append(_svg_text(px, py, f"{100 * count / total:.1f}%"))
+        start = end
+    out.append('</svg>')
+    return "".join(out)
+
+def _nice_step(max_value, max_ticks=8):
+    step = 1
+    while True:
+        for mult in (1, 2, 5):
+            if max_value / (step * mult) <= max_ticks:
+                return step * mult
+        step *= 10
+
+def render_top5_svg(top5_plot_data):
+    """Horizontal bar chart of (label, count) pairs, first at the bottom, as SVG."""
+    w, h = 1000, 500
+    left, right, top, bottom = 350, 980, 40, 440
+    labels = [label[:40] + '…' if len(label) > 40 else label
+              for label, _ in top5_plot_data]
+    counts = [count for _, count in top5_plot_data]
+    step = _nice_step(max(counts))
+    x_max = max(counts) * 1.05
+    scale = (right - left) / x_max
+    slot = (bottom - top) / len(counts)
+
+    out = [_SVG_OPEN.format(w=w, h=h),
+           _svg_text((left + right) / 2, 22, 'Top 5 Interests / Items', size=14)]
+    for i, (label, count) in enumerate(zip(labels, counts, strict=True)):
+        y = bottom - (i + 0.5) * slot
+        out.append(f'<rect x="{left}" y="{y - slot * 0.4:.1f}" '
+                   f'width="{count * scale:.1f}" height="{slot * 0.8:.1f}" '
+                   f'fill="{CHART_COLORS[0]}"/>')
+        out.append(_svg_text(left - 8, y, label, anchor="end"))
+    for tick in range(0, int(x_max) + 1, step):
+        x = left + tick * scale
+        out.append(f'<line x1="{x:.1f}" y1="{bottom}" x2="{x:.1f}" y2="{bottom + 5}" '
+                   f'stroke="#000"/>')
+        out.append(_svg_text(x, bottom + 16, tick))
+    out.append(f'<rect x="{left}" y="{top}" width="{right - left}" '
+               f'height="{bottom - top}" fill="none" stroke="#000"/>')
+    out.append(_svg_text((left + right) / 2, bottom + 40, 'Frequency'))
+    out.append('</svg>')
+    return "".join(out)
+
 # ------------------- Routes -------------------
 @app.route('/')
 def index():
@@ -298,8 +571,8 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
-        chart_url = None
-        top5_chart_url = None
+        chart_data_uri = None
+        top5_chart_data_uri = None
         display_top5 = []
 
         if 'file' not in request.files:
@@ -313,60 +586,47 @@ def upload_file():
         if not os.path.exists(app.config['UPLOAD_FOLDER']):
             os.makedirs(app.config['UPLOAD_FOLDER'])
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        digest = save_upload(file, filepath)
 
-        # Choose analyzer
+        # Choose analyzer mode
         if "search" in filename_lower:
-            categories, top5_data, activity_times = analyze_search_file(filepath)
+            mode = "search"
         elif "youtube" in filename_lower or "watch" in filename_lower:
-            categories, top5_data, activity_times = analyze_youtube_file(filepath)
+            mode = "youtube"
         elif "discover" in filename_lower or "myactivity" in filename_lower:
-            categories, top5_data, activity_times = analyze_discover_file(filepath)
+            mode = "discover"
         else:
-            categories, top5_data, activity_times = analyze_generic_file(filepath)
+            mode = "generic"
+        result = load_cached_analysis(digest, mode)
+        if result is None:
+            result = analyze_file(filepath, mode)
+            try:
+                store_cached_analysis(digest, mode, result)
+            except OSError:  # the analysis is done; a cache miss next time is fine
+                app.logger.exception("Could not cache the analysis of %s", filename)
+        categories, top5_data, activity_times = result
 
         # Risk Meter (+ suggestions + percent)
         risk_level, risk_color, risk_message, risk_suggestions, risk_percent = calculate_risk(categories, recent_activities=activity_times)
 
         # Pie Chart (only non-zero categories)
         filtered_categories = {k: v for k, v in categories.items() if v > 0}
-        if filtered_categories:
-            plt.figure(figsize=(6, 6))
-            plt.pie(list(filtered_categories.values()), labels=list(filtered_categories.keys()),
-                    autopct='%1.1f%%', startangle=90)
-            plt.title('Activity Breakdown')
-            if not os.path.exists('static'):
-                os.makedirs('static')
-            chart_url = 'activity_chart.png'
-            plt.savefig(os.path.join('static', chart_url))
-            plt.close()
-
         # Top 5 Chart (now enabled for ALL types when data exists)
         top5_plot_data = [(label, count) for label, count in (top5_data or []) if label and count and label != "No data found"]
         display_top5 = top5_plot_data
+
+        if filtered_categories:
+            chart_data_uri = svg_data_uri(render_pie_svg(filtered_categories))
         if top5_plot_data:
-            top_labels, top_counts = zip(*top5_plot_data)
-            display_labels = [label[:40] + '…' if len(label) > 40 else label for label in top_labels]
-
-            plt.figure(figsize=(10, 5))
-            plt.barh(display_labels, top_counts)
-            plt.xlabel('Frequency')
-            plt.title('Top 5 Interests / Items')
-            plt.tight_layout()
-            if not os.path.exists('static'):
-                os.makedirs('static')
-            safe_filename = re.sub(r'\W+', '_', filename_lower)
-            top5_chart_url = f"top5_{safe_filename}.png"
-            plt.savefig(os.path.join('static', top5_chart_url))
-            plt.close()
+            top5_chart_data_uri = svg_data_uri(render_top5_svg(top5_plot_data))
 
         return render_template(
             'index.html',
             filename=filename,
             categories=categories,
             top_5_data=display_top5,
-            chart_url=chart_url,
-            top5_chart_url=top5_chart_url,
+            chart_data_uri=chart_data_uri,
+            top5_chart_data_uri=top5_chart_data_uri,
             risk_level=risk_level,
             risk_color=risk_color,
             suggestion=risk_message,          # keep your existing var name
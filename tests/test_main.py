@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from main import analyze_file
+
+
+class AnalyzeFileTest(unittest.TestCase):
+    def analyze(self, html, mode):
+        fd, path = tempfile.mkstemp(suffix='.html')
+        self.addCleanup(os.unlink, path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        return analyze_file(path, mode)
+
+    def test_top_level_div_with_own_text_is_kept(self):
+        categories, top5, _ = self.analyze(
+            '<html><body><div><div>Searched for apples</div></div>'
+            '<div>Searched for bananas<div>cherry pie</div></div></body></html>',
+            'search')
+        self.assertEqual(categories, {'Search': 2, 'Other': 1})
+        self.assertIn(('bananas cherry pie', 1), top5)
+
+    def test_cards_outside_a_grid_are_scanned_once(self):
+        card = ('<div class="outer-cell mdl-cell"><div class="mdl-grid">'
+                '<div class="header-cell mdl-cell"><p>YouTube</p></div>'
+                '<div class="content-cell mdl-cell mdl-typography--body-1">Watched '
+                '<a href="https://www.youtube.com/watch?v=1">Cats</a></div>'
+                '<div class="content-cell mdl-cell mdl-typography--caption">'
+                '<b>Products:</b><br>YouTube<br>'
+                '<a href="https://myaccount.google.com/activitycontrols">here</a>'
+                '</div></div></div>')
+        categories, top5, _ = self.analyze(
+            f'<html><body>{card}{card}</body></html>', 'generic')
+        self.assertEqual(categories['YouTube'], 2)
+        self.assertEqual(sum(categories.values()), 2)
+        self.assertEqual(top5, [('cats', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()